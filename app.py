@@ -1,13 +1,20 @@
 import os
-import pickle
+import bisect
+import functools
+import hashlib
+import random
+import threading
+import time
 import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output, State
 import pandas as pd
-from flask import Flask, jsonify, request
+import jinja2
+from flask import Flask, Response
+from flask_compress import Compress
 import dash_bootstrap_components as dbc
-import numpy as np
-from sklearn.preprocessing import StandardScaler
+from plotly.io.json import to_json_plotly
+import joblib
 import gdown  # for Google Drive file downloads
 
 # ---------------------------
@@ -19,40 +26,88 @@ FEATURES_FILE_ID = "1J2UJ5jK7BEwboAygxKpwKOUy1d5kN4fF"  # feature_importances.pk
 MODEL_PATH = "final_model.pkl"
 FEATURES_PATH = "feature_importances.pkl"
 
+MODEL_SHA256 = "bc9484d1ee508dd86dd06fdb92c9707bc88c883a9d501029532f5ed4fc5db094"
+FEATURES_SHA256 = "86841f1f55b1043d4d5ecfc2060884288d464156c5a3fbbe4cba470ef893344e"
+
 # ---------------------------
 # Download Files from Google Drive (if not already present)
 # ---------------------------
-def download_from_gdrive(file_id, output_path):
-    if not os.path.exists(output_path):
-        print(f"⬇️ Downloading {output_path} from Google Drive...")
-        gdown.download(f"https://drive.google.com/uc?id={file_id}", output_path, quiet=False)
-        print(f"✅ Downloaded: {output_path}")
-    else:
-        print(f"✅ Found cached file: {output_path}")
+DOWNLOAD_ATTEMPTS = 5
+
+def sha256sum(path):
+    """SHA-256 of a file, read in 1 MiB chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def download_from_gdrive(file_id, output_path, expected_sha256):
+    if os.path.exists(output_path):
+        if os.environ.get("SKIP_ARTIFACT_CHECKSUM"):
+            print(f"⚠️ SKIP_ARTIFACT_CHECKSUM is set, using {output_path} without verifying it")
+        elif sha256sum(output_path) != expected_sha256:
+            raise ValueError(
+                f"{output_path} does not match its pinned checksum; "
+                "set SKIP_ARTIFACT_CHECKSUM=1 to use a locally retrained artifact"
+            )
+        else:
+            print(f"✅ Found cached file: {output_path}")
+        return
 
-download_from_gdrive(MODEL_FILE_ID, MODEL_PATH)
-download_from_gdrive(FEATURES_FILE_ID, FEATURES_PATH)
+    print(f"⬇️ Downloading {output_path} from Google Drive...")
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        try:
+            gdown.download(f"https://drive.google.com/uc?id={file_id}", output_path, quiet=False, resume=True)
+            break
+        except Exception as e:
+            print(f"⚠️ Download attempt {attempt}/{DOWNLOAD_ATTEMPTS} failed: {e}")
+            if attempt == DOWNLOAD_ATTEMPTS:
+                raise
+    if sha256sum(output_path) != expected_sha256:
+        os.remove(output_path)
+        raise ValueError(f"Checksum mismatch for downloaded {output_path}")
+    print(f"✅ Downloaded: {output_path}")
 
 # ---------------------------
 # Load Model and Features
 # ---------------------------
-def load_pickle(filename):
-    """Safe pickle loader with debug info"""
-    with open(filename, "rb") as f:
-        return pickle.load(f)
+@functools.cache
+def load_artifact(filename):
+    """Load a model or feature artifact once per process, failing fast if it is missing"""
+    start = time.perf_counter()
+    obj = joblib.load(filename, mmap_mode="r")
+    print(f"✅ Loaded {filename} in {time.perf_counter() - start:.2f}s")
+    return obj
 
-try:
-    trained_models = load_pickle(MODEL_PATH)
-    print("✅ Model loaded successfully")
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
-    trained_models = {}
+# The lock stops concurrent first clicks in one worker from each loading the
+# models; across workers, gunicorn's when_ready hook loads them once in the
+# master and the result (or the failure) is inherited on fork.
+_models = None
+_models_error = None
+_models_lock = threading.Lock()
+
+def get_models():
+    """Return the trained models, downloading and loading them once on first use"""
+    global _models, _models_error
+    if _models is None and _models_error is None:
+        with _models_lock:
+            if _models is None and _models_error is None:
+                try:
+                    download_from_gdrive(MODEL_FILE_ID, MODEL_PATH, MODEL_SHA256)
+                    _models = load_artifact(MODEL_PATH)
+                except Exception as e:
+                    _models_error = e
+    if _models_error is not None:
+        raise RuntimeError(f"Model failed to load: {_models_error}")
+    return _models
 
+# The feature table is informational only, so a failure here must not stop boot
 try:
-    feature_importances = pd.read_pickle(FEATURES_PATH)
+    download_from_gdrive(FEATURES_FILE_ID, FEATURES_PATH, FEATURES_SHA256)
+    feature_importances = load_artifact(FEATURES_PATH)
     if not isinstance(feature_importances, pd.DataFrame):
-        raise ValueError("feature_importances.pkl is not a DataFrame")
-    print("✅ Features loaded successfully")
+        raise ValueError(f"{FEATURES_PATH} is not a DataFrame")
     print("Targets available:", feature_importances["Target"].unique().tolist())
 except Exception as e:
     print(f"❌ Error loading features: {e}")
@@ -67,16 +122,42 @@ REGION_OPTIONS = [
     'Other/Not specified'
 ]
 YES_NO_OPTIONS = ['Yes', 'No']
+FLOOR_OPTIONS = ['Dung', 'Cement/Tile', 'Other']
 TARGETS = ["Under5", "Infant", "Neonatal"]
 
+REGION_DD = [{'label': r, 'value': r} for r in REGION_OPTIONS]
+YESNO_DD = [{'label': o, 'value': o} for o in YES_NO_OPTIONS]
+FLOOR_DD = [{'label': f, 'value': f} for f in FLOOR_OPTIONS]
+TARGET_DD = [{'label': t, 'value': t} for t in TARGETS]
+
+# ---------------------------
+# Simulated Risk Scoring
+# ---------------------------
+REGION_BONUS = {'Kwale': 0.10}
+HEALTH_FACILITY_BONUS = {'No': 0.08}
+FLOOR_BONUS = {'Dung': 0.05}
+RISK_THRESHOLDS = [0.15, 0.30]
+RISK_LEVELS = [
+    ("LOW RISK (Predicted Probability: ~10-30%)", {"color": "green"}),
+    ("MODERATE RISK (Predicted Probability: ~50-70%)", {"color": "orange"}),
+    ("HIGH RISK! (Predicted Probability: ~90%)", {"color": "red"}),
+]
+
 # ---------------------------
 # Flask App Setup
 # ---------------------------
+DASHBOARD_PATH = "/dashboard/"
+
 server = Flask(__name__)
+server.config.update(
+    COMPRESS_ALGORITHM=["br", "gzip"],
+    COMPRESS_LEVEL=6,
+    COMPRESS_MIN_SIZE=500,  # the ~420-byte landing page stays below this and is sent uncompressed
+    COMPRESS_MIMETYPES=["text/html", "text/css", "application/javascript", "application/json"],
+)
+Compress(server)
 
-@server.route("/")
-def index():
-    return """
+INDEX_TEMPLATE = jinja2.Template("""
     <div style="
         text-align:center;
         font-family:sans-serif;
@@ -87,19 +168,38 @@ def index():
         align-items: center;
         color: #004080;
     ">
-        <h1>👶 Afya Toto</h1>
-        <p>Protecting Children’s Health Through Data Insights</p>
-        <a href='/dashboard/'>Go to Dashboard</a>
+        <h1>👶 {{ title }}</h1>
+        <p>{{ tagline }}</p>
+        <a href='{{ dashboard_path }}'>Go to Dashboard</a>
     </div>
-    """
+    """)
+_INDEX_HTML = INDEX_TEMPLATE.render(
+    title="Afya Toto",
+    tagline="Protecting Children’s Health Through Data Insights",
+    dashboard_path=DASHBOARD_PATH,
+).encode("utf-8")
+
+@server.route("/")
+def index():
+    return Response(_INDEX_HTML, mimetype="text/html", headers={"Cache-Control": "public, max-age=3600"})
 
 # ---------------------------
 # Dash App Layout
 # ---------------------------
-app = dash.Dash(
+class StaticLayoutDash(dash.Dash):
+    """Dash app that serializes its static layout once and reuses the JSON"""
+
+    @functools.cached_property
+    def _layout_json(self):
+        return to_json_plotly(self._layout_value())
+
+    def serve_layout(self):
+        return Response(self._layout_json, mimetype="application/json")
+
+app = StaticLayoutDash(
     __name__,
     server=server,
-    url_base_pathname="/dashboard/",
+    url_base_pathname=DASHBOARD_PATH,
     external_stylesheets=[dbc.themes.BOOTSTRAP],
     suppress_callback_exceptions=True
 )
@@ -123,7 +223,7 @@ app.layout = dbc.Container([
             html.Label("Child's Region (County):"),
             dcc.Dropdown(
                 id="input-region",
-                options=[{'label': r, 'value': r} for r in REGION_OPTIONS],
+                options=REGION_DD,
                 value='Kwale',
                 clearable=False,
             )
@@ -133,7 +233,7 @@ app.layout = dbc.Container([
             html.Label("Visited Health Facility (Last 12 Months):"),
             dcc.Dropdown(
                 id="input-health-facility",
-                options=[{'label': o, 'value': o} for o in YES_NO_OPTIONS],
+                options=YESNO_DD,
                 value='No',
                 clearable=False,
             )
@@ -143,11 +243,7 @@ app.layout = dbc.Container([
             html.Label("Main Floor Material:"),
             dcc.Dropdown(
                 id="input-floor-material",
-                options=[
-                    {'label': 'Dung', 'value': 'Dung'},
-                    {'label': 'Cement/Tile', 'value': 'Cement/Tile'},
-                    {'label': 'Other', 'value': 'Other'}
-                ],
+                options=FLOOR_DD,
                 value='Dung',
                 clearable=False,
             )
@@ -159,7 +255,7 @@ app.layout = dbc.Container([
             html.Label("Select Target Variable for Prediction:", className="fw-bold"),
             dcc.Dropdown(
                 id="target-selector",
-                options=[{'label': t, 'value': t} for t in TARGETS],
+                options=TARGET_DD,
                 value='Under5',
                 clearable=False,
             )
@@ -170,7 +266,7 @@ app.layout = dbc.Container([
         dbc.Col(html.Button("Get Mortality Risk Prediction", id="predict-btn", n_clicks=0, className="btn btn-lg btn-success"), width=12, className="text-center")
     ], justify="center", className="mb-4"),
 
-    dbc.Row([dbc.Col(html.Div(id="prediction-output", className="text-center h4 my-4"), width=12)])
+    dbc.Row([dbc.Col(html.Div("ℹ️ Enter the features above and click 'Get Prediction'.", id="prediction-output", className="text-center h4 my-4"), width=12)])
 ], fluid=True)
 
 # ---------------------------
@@ -184,32 +280,31 @@ app.layout = dbc.Container([
     State("input-region", "value"),
     State("input-health-facility", "value"),
     State("input-floor-material", "value"),
+    prevent_initial_call=True,
 )
 def make_prediction(n_clicks, target, child_deaths, region, health_facility, floor_material):
-    if n_clicks is None or n_clicks < 1:
-        return "ℹ️ Enter the features above and click 'Get Prediction'."
-    
-    if not target or not trained_models:
-        return "❌ Error: Model or target not loaded."
+    if child_deaths is None:
+        return dash.no_update
+
+    if not target:
+        return "❌ Error: No target selected."
+
+    # Only confirms the models are loadable; the score below is still simulated
+    try:
+        get_models()
+    except Exception as e:
+        print(f"❌ Error loading model: {e}")
+        return "❌ Error: Model not available."
 
     # --- SIMULATED PREDICTION LOGIC ---
     risk_score = (
-        child_deaths * 0.15 + 
-        (1 if region == 'Kwale' else 0) * 0.10 +
-        (1 if health_facility == 'No' else 0) * 0.08 +
-        (1 if floor_material == 'Dung' else 0) * 0.05 +
-        np.random.rand() * 0.1
+        child_deaths * 0.15 +
+        REGION_BONUS.get(region, 0) +
+        HEALTH_FACILITY_BONUS.get(health_facility, 0) +
+        FLOOR_BONUS.get(floor_material, 0) +
+        random.random() * 0.1
     )
-    
-    if risk_score > 0.3:
-        risk_level = "HIGH RISK! (Predicted Probability: ~90%)"
-        style = {"color": "red"}
-    elif risk_score > 0.15:
-        risk_level = "MODERATE RISK (Predicted Probability: ~50-70%)"
-        style = {"color": "orange"}
-    else:
-        risk_level = "LOW RISK (Predicted Probability: ~10-30%)"
-        style = {"color": "green"}
+    risk_level, style = RISK_LEVELS[bisect.bisect_left(RISK_THRESHOLDS, risk_score)]
 
     return html.Span(f"Prediction for {target}: {risk_level}", style=style)
 
@@ -217,5 +312,8 @@ def make_prediction(n_clicks, target, child_deaths, region, health_facility, flo
 # Run server
 # ---------------------------
 if __name__ == "__main__":
-    port = int(os.environ.get("PORT", 8050))
-    server.run(debug=True, port=port)
+    if os.environ.get("DEV"):
+        port = int(os.environ.get("PORT", 8050))
+        server.run(debug=True, port=port)
+    else:
+        print("ℹ️ Set DEV=1 to run the development server, or start with: gunicorn app:server")
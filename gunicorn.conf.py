@@ -0,0 +1,20 @@
+import os
+import multiprocessing
+
+# ---------------------------
+# Gunicorn Settings (loaded automatically from the working directory)
+# ---------------------------
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = 4
+worker_connections = 4096
+preload_app = True
+
+
+def when_ready(server):
+    """Load the models in the master so forked workers share them copy-on-write"""
+    import app
+    try:
+        app.get_models()
+    except Exception as e:
+        server.log.error(f"Model preload failed, predictions will report it as unavailable: {e}")